@@ -1,275 +1,673 @@
-class Token:
-    def __init__(self, type_, value):
-        self.type = type_
-        self.value = value
-    def __repr__(self):
-        return f"{self.type}:{self.value}"
+import operator
+import sys
+
+KEYWORDS = frozenset({'if', 'else', 'while', 'print', 'function', 'return', 'and', 'or', 'not', 'create'})
+_KEYWORD_TYPES = {kw: sys.intern(kw.upper()) for kw in KEYWORDS}
+
+# Two-character operators are looked up before single characters (longest match).
+_OPERATORS = {
+    '==': 'COMPARE', '!=': 'COMPARE', '<=': 'COMPARE', '>=': 'COMPARE',
+    '<': 'COMPARE', '>': 'COMPARE',
+    '=': 'ASSIGN',
+    ';': 'END',
+    '+': 'OP', '-': 'OP', '*': 'OP', '/': 'OP', '%': 'OP',
+    '(': 'LPAREN', ')': 'RPAREN',
+    '{': 'LBRACE', '}': 'RBRACE',
+}
+
+# Values of single-digit number literals, looked up instead of calling int().
+_DIGIT_VALUES = {str(d): d for d in range(10)}
+
+# Only these characters can start a two-character operator.
+_OPERATOR_PREFIXES = frozenset(op[0] for op in _OPERATORS if len(op) == 2)
+
+# Character classes for the lexer's dispatch table, indexed by ord(ch).
+_OTHER, _SPACE, _DIGIT, _ALPHA, _QUOTE, _PUNCT = range(6)
+
+_CHAR_CLASS = [_OTHER] * 256
+for _ch in ' \t\n':
+    _CHAR_CLASS[ord(_ch)] = _SPACE
+for _ch in '0123456789':
+    _CHAR_CLASS[ord(_ch)] = _DIGIT
+for _ch in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_':
+    _CHAR_CLASS[ord(_ch)] = _ALPHA
+_IDENT_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_0123456789')
+_CHAR_CLASS[ord('"')] = _QUOTE
+for _op in _OPERATORS:
+    for _ch in _op:
+        _CHAR_CLASS[ord(_ch)] = _PUNCT
+del _ch, _op
 
-import re
+# The token stream is kept as two parallel lists, token types and token values,
+# so the parser reads a type with a single list index.
 
 class Lexer:
+    __slots__ = ('text', 'types', 'values')
+
     def __init__(self, text):
         self.text = text
-        self.tokens = []
-        self.keywords = {'if', 'else', 'while', 'print', 'function', 'return', 'and', 'or', 'not', 'create'}
-        self.token_specification = [
-            ('NUMBER',   r'\d+'),
-            ('STRING',   r'"[^"]*"'),
-            ('ID',       r'[A-Za-z_][A-Za-z0-9_]*'),
-            ('ASSIGN',   r'='),
-            ('END',      r';'),
-            ('OP',       r'[+\-*/%]'),
-            ('COMPARE',  r'==|!=|<=|>=|<|>'),
-            ('LPAREN',   r'\('),
-            ('RPAREN',   r'\)'),
-            ('LBRACE',   r'\{'),
-            ('RBRACE',   r'\}'),
-            ('NEWLINE',  r'\n'),
-            ('SKIP',     r'[ \t]+'),
-            ('MISMATCH', r'.')
-        ]
+        self.types = []
+        self.values = []
 
     def tokenize(self):
-        tok_regex = '|'.join(f'(?P<{pair[0]}>{pair[1]})' for pair in self.token_specification)
-        for mo in re.finditer(tok_regex, self.text):
-            kind = mo.lastgroup
-            value = mo.group()
-            if kind == 'NUMBER':
-                value = int(value)
-            elif kind == 'STRING':
-                value = value.strip('"')
-            elif kind == 'ID' and value in self.keywords:
-                kind = value.upper()
-            elif kind in ('SKIP', 'NEWLINE'):
-                continue
-            elif kind == 'MISMATCH':
-                raise SyntaxError(f"Unexpected character {value}")
-            self.tokens.append(Token(kind, value))
-        self.tokens.append(Token('EOF', ''))
-        return self.tokens
+        text = self.text
+        n = len(text)
+        i = 0
+        # hot-loop globals and bound methods pulled into locals
+        char_class = _CHAR_CLASS
+        ident_chars = _IDENT_CHARS
+        keyword_type = _KEYWORD_TYPES.get
+        operator_type = _OPERATORS.get
+        add_type = self.types.append
+        add_value = self.values.append
+        while i < n:
+            ch = text[i]
+            code = ord(ch)
+            cls = char_class[code] if code < 256 else _OTHER
+            # classes are tested roughly in order of how often they occur
+            if cls == _SPACE:
+                i += 1
+            elif cls == _ALPHA:
+                start = i
+                i += 1
+                while i < n and text[i] in ident_chars:
+                    i += 1
+                value = text[start:i]
+                add_type(keyword_type(value, 'ID'))
+                add_value(value)
+            elif cls == _PUNCT:
+                kind = None
+                if ch in _OPERATOR_PREFIXES:
+                    op = text[i:i + 2]
+                    kind = operator_type(op)
+                if kind is None:
+                    op = ch
+                    kind = operator_type(op)
+                    if kind is None:
+                        raise SyntaxError(f"Unexpected character {ch}")
+                add_type(kind)
+                add_value(op)
+                i += len(op)
+            elif cls == _DIGIT:
+                start = i
+                i += 1
+                while i < n and '0' <= text[i] <= '9':
+                    i += 1
+                if i - start == 1:
+                    value = _DIGIT_VALUES[ch]
+                else:
+                    value = int(text[start:i], 10)
+                add_type('NUMBER')
+                add_value(value)
+            elif cls == _QUOTE:
+                end = text.find('"', i + 1)
+                if end < 0:
+                    raise SyntaxError(f"Unexpected character {ch}")
+                add_type('STRING')
+                add_value(text[i + 1:end])
+                i = end + 1
+            else:
+                raise SyntaxError(f"Unexpected character {ch}")
+        add_type('EOF')
+        add_value('')
+        return self.types, self.values
 
 class ReturnValue(Exception):
     def __init__(self, value=None):
         self.value = value
 
-class Interpreter:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
-        self.env = {}
-        self.declared_vars = set()
+class SymbolTable:
+    """Name-to-slot numbering for one session. Variables are resolved to
+    integer slots while parsing; the Evaluator owning the table keeps their
+    values in a list indexed by slot. create rejects any name that is
+    already visible, so a name is never shadowed and one slot per name is
+    enough. Function names are numbered the same way in a table of their own."""
+    __slots__ = ('variables', 'functions')
+
+    def __init__(self):
+        self.variables = {}
         self.functions = {}
 
+    def variable(self, name):
+        return self.variables.setdefault(name, len(self.variables))
+
+    def function(self, name):
+        return self.functions.setdefault(name, len(self.functions))
+
+# AST nodes. Expressions implement evaluate(ev), statements execute(ev),
+# where ev is the Evaluator holding the runtime state.
+
+class Literal:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, ev):
+        return self.value
+
+    def source(self, compiler):
+        return repr(self.value)
+
+class Name:
+    __slots__ = ('name', 'slot', 'bit')
+
+    def __init__(self, name, slot):
+        self.name = name
+        self.slot = slot
+        self.bit = 1 << slot
+
+    def evaluate(self, ev):
+        if not ev.declared & self.bit:
+            raise Exception(f"Variable '{self.name}' not declared. Use 'create' keyword first.")
+        return ev.slots[self.slot]
+
+    def source(self, compiler):
+        return compiler.var(self.slot)
+
+class Logical:
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def evaluate(self, ev):
+        # the right operand only runs when the left one doesn't decide the result
+        if self.op == 'AND':
+            return self.left.evaluate(ev) and self.right.evaluate(ev)
+        return self.left.evaluate(ev) or self.right.evaluate(ev)
+
+    def source(self, compiler):
+        op = 'and' if self.op == 'AND' else 'or'
+        return f"({self.left.source(compiler)} {op} {self.right.source(compiler)})"
+
+_CMP_OPS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '>': operator.gt,
+    '<=': operator.le, '>=': operator.ge,
+}
+
+class Compare:
+    __slots__ = ('op', 'func', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.func = _CMP_OPS[op]
+        self.left = left
+        self.right = right
+
+    def evaluate(self, ev):
+        return self.func(self.left.evaluate(ev), self.right.evaluate(ev))
+
+    def source(self, compiler):
+        # parenthesised so Python never chains comparisons
+        return f"({self.left.source(compiler)} {self.op} {self.right.source(compiler)})"
+
+class CompareName:
+    """Compare specialised for the common `name <op> literal` shape, e.g. a
+    loop guard, reading the slot directly instead of evaluating two nodes."""
+    __slots__ = ('op', 'func', 'name', 'value')
+
+    def __init__(self, op, name, value):
+        self.op = op
+        self.func = _CMP_OPS[op]
+        self.name = name
+        self.value = value
+
+    def evaluate(self, ev):
+        name = self.name
+        if not ev.declared & name.bit:
+            raise Exception(f"Variable '{name.name}' not declared. Use 'create' keyword first.")
+        return self.func(ev.slots[name.slot], self.value)
+
+    def source(self, compiler):
+        return f"({self.name.source(compiler)} {self.op} {self.value!r})"
+
+# Node builders used by the parser. They fold operations on constants into a
+# Literal while the AST is built, so such subexpressions cost nothing at runtime.
+
+def make_logical(op, left, right):
+    if type(left) is Literal:
+        # a constant left operand decides whether the right one is the result
+        if op == 'AND':
+            return right if left.value else left
+        return left if left.value else right
+    return Logical(op, left, right)
+
+def make_compare(op, left, right):
+    if type(left) is Literal and type(right) is Literal:
+        try:
+            return Literal(_CMP_OPS[op](left.value, right.value))
+        except TypeError:
+            # e.g. 1 < "a": leave it to raise when (and if) it is evaluated
+            pass
+    elif type(left) is Name and type(right) is Literal:
+        return CompareName(op, left, right.value)
+    return Compare(op, left, right)
+
+class Declare:
+    __slots__ = ('name', 'slot', 'bit', 'expr')
+
+    def __init__(self, name, slot, expr):
+        self.name = name
+        self.slot = slot
+        self.bit = 1 << slot
+        self.expr = expr
+
+    def execute(self, ev):
+        if ev.declared & self.bit:
+            raise Exception(f"Variable '{self.name}' already declared.")
+        ev.slots[self.slot] = self.expr.evaluate(ev)
+        ev.declared |= self.bit
+
+class Assign:
+    __slots__ = ('name', 'slot', 'bit', 'expr')
+
+    def __init__(self, name, slot, expr):
+        self.name = name
+        self.slot = slot
+        self.bit = 1 << slot
+        self.expr = expr
+
+    def execute(self, ev):
+        if not ev.declared & self.bit:
+            raise Exception(f"Variable '{self.name}' not declared. Use 'create' keyword first.")
+        ev.slots[self.slot] = self.expr.evaluate(ev)
+
+class Print:
+    __slots__ = ('expr',)
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    def execute(self, ev):
+        print(self.expr.evaluate(ev))
+
+class If:
+    __slots__ = ('condition', 'body', 'orelse')
+
+    def __init__(self, condition, body, orelse):
+        self.condition = condition
+        self.body = body
+        self.orelse = orelse
+
+    def execute(self, ev):
+        ev.execute_block(self.body if self.condition.evaluate(ev) else self.orelse)
+
+# Interpreted iterations before a loop is handed to LoopCompiler.
+_JIT_THRESHOLD = 50
+
+class While:
+    __slots__ = ('condition', 'body', 'iterations', 'kernel')
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+        self.iterations = 0
+        # None: not compiled yet; False: LoopCompiler refused it, stay interpreted;
+        # otherwise the (function, declared mask) pair from LoopCompiler.compile
+        self.kernel = None
+
+    def execute(self, ev):
+        if self.kernel is None and self.iterations >= _JIT_THRESHOLD:
+            self.kernel = LoopCompiler().compile(self) or False
+        if self.kernel and self.run_kernel(ev):
+            return
+        while self.condition.evaluate(ev):
+            ev.execute_block(self.body)
+            if self.kernel is None:
+                self.iterations += 1
+                if self.iterations >= _JIT_THRESHOLD:
+                    self.kernel = LoopCompiler().compile(self) or False
+                    # the kernel starts at the loop head and reads everything from
+                    # ev.slots, so it can take over between two iterations
+                    if self.kernel and self.run_kernel(ev):
+                        return
+
+    def run_kernel(self, ev):
+        func, mask = self.kernel
+        # an undeclared name has to raise where the interpreter would reach it
+        if ev.declared & mask != mask:
+            return False
+        func(ev.slots)
+        return True
+
+class FunctionDef:
+    __slots__ = ('name', 'slot', 'body')
+
+    def __init__(self, name, slot, body):
+        self.name = name
+        self.slot = slot
+        self.body = body
+
+    def execute(self, ev):
+        ev.functions[self.slot] = self.body
+
+class Call:
+    __slots__ = ('name', 'slot')
+
+    def __init__(self, name, slot):
+        self.name = name
+        self.slot = slot
+
+    def execute(self, ev):
+        body = ev.functions[self.slot]
+        if body is None:
+            raise Exception(f"Function {self.name} not defined")
+        try:
+            ev.execute_block(body)
+        except ReturnValue as rv:
+            return rv.value
+
+class Return:
+    __slots__ = ('expr',)
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    def execute(self, ev):
+        raise ReturnValue(self.expr.evaluate(ev) if self.expr is not None else None)
+
+class LoopCompiler:
+    """Generates a Python function for a hot while loop whose body only
+    assigns, prints and nests further if/while statements. Variables are
+    kept in locals while the loop runs and written back to their slots
+    afterwards. Loops that declare variables, call functions or return
+    are left to the interpreter."""
+    __slots__ = ('used', 'assigned', 'lines')
+
+    def __init__(self):
+        self.used = set()
+        self.assigned = set()
+        self.lines = []
+
+    def var(self, slot):
+        self.used.add(slot)
+        return f"v{slot}"
+
+    def block(self, body, indent):
+        if not body:
+            self.lines.append('    ' * indent + 'pass')
+            return True
+        return all(self.statement(stmt, indent) for stmt in body)
+
+    def statement(self, stmt, indent):
+        pad = '    ' * indent
+        kind = type(stmt)
+        if kind is Assign:
+            self.assigned.add(stmt.slot)
+            self.lines.append(f"{pad}{self.var(stmt.slot)} = {stmt.expr.source(self)}")
+            return True
+        elif kind is Print:
+            self.lines.append(f"{pad}print({stmt.expr.source(self)})")
+            return True
+        elif kind is If:
+            self.lines.append(f"{pad}if {stmt.condition.source(self)}:")
+            if not self.block(stmt.body, indent + 1):
+                return False
+            self.lines.append(f"{pad}else:")
+            return self.block(stmt.orelse, indent + 1)
+        elif kind is While:
+            self.lines.append(f"{pad}while {stmt.condition.source(self)}:")
+            return self.block(stmt.body, indent + 1)
+        return False
+
+    def compile(self, loop):
+        # Deeply nested loops or very long guards can exceed CPython's limits on
+        # nested blocks and parentheses (or the recursion limit while generating
+        # source). The interpreter runs such loops fine, so they just stay interpreted.
+        try:
+            return self._compile(loop)
+        except (SyntaxError, RecursionError, MemoryError):
+            return None
+
+    def _compile(self, loop):
+        if not self.statement(loop, 2):
+            return None
+        used = sorted(self.used)
+        lines = ["def _loop(slots):"]
+        lines += [f"    v{slot} = slots[{slot}]" for slot in used]
+        lines.append("    try:")
+        lines += self.lines
+        lines.append("    finally:")
+        lines += [f"        slots[{slot}] = v{slot}" for slot in sorted(self.assigned)]
+        if not self.assigned:
+            lines.append("        pass")
+        namespace = {}
+        exec(compile('\n'.join(lines), '<loop>', 'exec'), namespace)
+        mask = 0
+        for slot in used:
+            mask |= 1 << slot
+        return namespace['_loop'], mask
+
+_LOGICAL_OPS = frozenset({'AND', 'OR'})
+
+class Parser:
+    __slots__ = ('types', 'values', 'symbols', 'pos')
+
+    def __init__(self, types, values, symbols):
+        self.types = types
+        self.values = values
+        self.symbols = symbols
+        self.pos = 0
+
     def consume(self, expected_type=None):
-        token = self.tokens[self.pos]
-        if expected_type and token.type != expected_type:
-            raise SyntaxError(f"Expected {expected_type}, got {token.type}")
-        self.pos += 1
-        return token
+        """Advance past the current token and return its value."""
+        pos = self.pos
+        if expected_type and self.types[pos] != expected_type:
+            raise SyntaxError(f"Expected {expected_type}, got {self.types[pos]}")
+        self.pos = pos + 1
+        return self.values[pos]
 
     def current(self):
-        return self.tokens[self.pos]
+        return self.types[self.pos]
 
     def peek(self):
-        return self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else Token('EOF', '')
+        return self.types[self.pos + 1] if self.pos + 1 < len(self.types) else 'EOF'
+
+    def describe(self):
+        return f"{self.types[self.pos]}:{self.values[self.pos]}"
 
     def parse(self):
-        while self.current().type != 'EOF':
-            self.statement()
+        program = []
+        while self.current() != 'EOF':
+            program.append(self.statement())
+        return program
 
     def statement(self):
-        curr = self.current()
-        if curr.type == 'CREATE':
-            self.declaration()
-        elif curr.type == 'ID' and self.peek().type == 'ASSIGN':
-            self.assignment()
-        elif curr.type == 'ID' and self.peek().type == 'LPAREN':
-            self.function_call()
-            self.consume('END')
-        elif curr.type == 'PRINT':
-            self.consume('PRINT')
-            val = self.expr()
-            print(val)
-            self.consume('END')
-        elif curr.type == 'IF':
-            self.if_statement()
-        elif curr.type == 'WHILE':
-            self.while_statement()
-        elif curr.type == 'FUNCTION':
-            self.function_definition()
-        elif curr.type == 'RETURN':
-            self.consume('RETURN')
-            if self.current().type != 'END':
-                value = self.expr()
-            else:
-                value = None
+        handler = self._STMT_DISPATCH.get(self.current())
+        if handler is None:
+            raise SyntaxError(f"Unknown statement at {self.describe()}")
+        return handler(self)
+
+    def id_statement(self):
+        next_type = self.peek()
+        if next_type == 'ASSIGN':
+            return self.assignment()
+        elif next_type == 'LPAREN':
+            node = self.function_call()
             self.consume('END')
-            raise ReturnValue(value)
+            return node
+        raise SyntaxError(f"Unknown statement at {self.describe()}")
+
+    def print_statement(self):
+        self.consume('PRINT')
+        node = Print(self.expr())
+        self.consume('END')
+        return node
+
+    def return_statement(self):
+        self.consume('RETURN')
+        if self.current() != 'END':
+            value = self.expr()
         else:
-            raise SyntaxError(f"Unknown statement at {curr}")
+            value = None
+        self.consume('END')
+        return Return(value)
 
     def declaration(self):
         self.consume('CREATE')
-        var = self.consume('ID').value
-        if var in self.declared_vars:
-            raise Exception(f"Variable '{var}' already declared.")
+        var = self.consume('ID')
         self.consume('ASSIGN')
-        value = self.expr()
-        self.env[var] = value
-        self.declared_vars.add(var)
+        node = Declare(var, self.symbols.variable(var), self.expr())
         self.consume('END')
+        return node
 
     def assignment(self):
-        var = self.consume('ID').value
-        if var not in self.declared_vars:
-            raise Exception(f"Variable '{var}' not declared. Use 'create' keyword first.")
+        var = self.consume('ID')
         self.consume('ASSIGN')
-        value = self.expr()
-        self.env[var] = value
+        node = Assign(var, self.symbols.variable(var), self.expr())
         self.consume('END')
+        return node
 
     def if_statement(self):
         self.consume('IF')
         self.consume('LPAREN')
         condition = self.expr()
         self.consume('RPAREN')
-        self.consume('LBRACE')
-        true_block = self.collect_block()
+        true_block = self.block()
         false_block = []
-        if self.current().type == 'ELSE':
+        if self.current() == 'ELSE':
             self.consume('ELSE')
-            self.consume('LBRACE')
-            false_block = self.collect_block()
-        block = true_block if condition else false_block
-        Interpreter(block).execute_with_env(self.env.copy(), self.functions.copy())
+            false_block = self.block()
+        return If(condition, true_block, false_block)
 
     def while_statement(self):
         self.consume('WHILE')
         self.consume('LPAREN')
-        condition_tokens = []
-        # collect tokens until RPAREN
-        while self.current().type != 'RPAREN':
-            condition_tokens.append(self.tokens[self.pos])
-            self.pos += 1
+        condition = self.expr()
         self.consume('RPAREN')
-        self.consume('LBRACE')
-        body = self.collect_block()
-        while Interpreter(condition_tokens).evaluate_with_env(self.env.copy()):
-            Interpreter(body.copy()).execute_with_env(self.env.copy(), self.functions.copy())
+        return While(condition, self.block())
 
     def function_definition(self):
         self.consume('FUNCTION')
-        name = self.consume('ID').value
+        name = self.consume('ID')
         self.consume('LPAREN')
         self.consume('RPAREN')
-        self.consume('LBRACE')
-        body = self.collect_block()
-        self.functions[name] = body
+        return FunctionDef(name, self.symbols.function(name), self.block())
 
     def function_call(self):
-        name = self.consume('ID').value
+        name = self.consume('ID')
         self.consume('LPAREN')
         self.consume('RPAREN')
-        if name not in self.functions:
-            raise Exception(f"Function {name} not defined")
-        block = self.functions[name]
-        try:
-            Interpreter(block).execute_with_env(self.env.copy(), self.functions.copy())
-        except ReturnValue as rv:
-            return rv.value
+        return Call(name, self.symbols.function(name))
 
-    def collect_block(self):
-        block = []
-        while self.current().type != 'RBRACE':
-            block.append(self.tokens[self.pos])
-            self.pos += 1
+    def block(self):
+        self.consume('LBRACE')
+        body = []
+        while self.current() != 'RBRACE':
+            body.append(self.statement())
         self.consume('RBRACE')
-        return block
+        return body
+
+    # statement() looks up the handler for the leading token type here
+    _STMT_DISPATCH = {
+        'CREATE': declaration,
+        'ID': id_statement,
+        'PRINT': print_statement,
+        'IF': if_statement,
+        'WHILE': while_statement,
+        'FUNCTION': function_definition,
+        'RETURN': return_statement,
+    }
 
     def expr(self):
         result = self.compare_expr()
-        while self.current().type in ('AND', 'OR'):
-            op = self.consume().type
-            right = self.compare_expr()
-            if op == 'AND':
-                result = result and right
-            elif op == 'OR':
-                result = result or right
+        while self.current() in _LOGICAL_OPS:
+            op = self.current()
+            self.consume()
+            result = make_logical(op, result, self.compare_expr())
         return result
 
     def compare_expr(self):
         left = self.term()
-        while self.current().type == 'COMPARE':
-            op = self.consume().value
-            right = self.term()
-            if op == '==': left = (left == right)
-            elif op == '!=': left = (left != right)
-            elif op == '<': left = (left < right)
-            elif op == '>': left = (left > right)
-            elif op == '<=': left = (left <= right)
-            elif op == '>=': left = (left >= right)
+        while self.current() == 'COMPARE':
+            op = self.consume()
+            left = make_compare(op, left, self.term())
         return left
 
     def term(self):
-        token = self.current()
-        if token.type == 'NUMBER':
-            return self.consume('NUMBER').value
-        elif token.type == 'STRING':
-            return self.consume('STRING').value
-        elif token.type == 'ID':
-            var_name = self.consume('ID').value
-            if var_name not in self.declared_vars:
-                raise Exception(f"Variable '{var_name}' not declared. Use 'create' keyword first.")
-            return self.env.get(var_name, 0)
-        elif token.type == 'LPAREN':
+        kind = self.current()
+        if kind == 'NUMBER' or kind == 'STRING':
+            return Literal(self.consume())
+        elif kind == 'ID':
+            name = self.consume()
+            return Name(name, self.symbols.variable(name))
+        elif kind == 'LPAREN':
             self.consume('LPAREN')
-            val = self.expr()
+            node = self.expr()
             self.consume('RPAREN')
-            return val
+            return node
         else:
-            raise SyntaxError(f"Unexpected token in term: {token}")
+            raise SyntaxError(f"Unexpected token in term: {self.describe()}")
 
-    def evaluate_with_env(self, env):
-        self.env = env
-        self.pos = 0
-        return self.expr()
+# Parsed programs each Evaluator keeps, keyed by source text.
+_PARSE_CACHE_SIZE = 256
 
-    def execute_with_env(self, env, functions):
-        self.env = env
-        self.declared_vars = set(env.keys())
-        self.functions = functions
-        self.pos = 0
-        self.parse()
+class Evaluator:
+    __slots__ = ('symbols', 'slots', 'declared', 'functions', 'programs')
+
+    def __init__(self):
+        # programs run here must be parsed against this table; see parse()
+        self.symbols = SymbolTable()
+        self.slots = []
+        # bit n is set while the variable in slot n is declared
+        self.declared = 0
+        self.functions = []
+        # The parser never backtracks, so the only repeated parse work is the
+        # REPL being handed the same input again; cache programs by source text.
+        # The cache is per evaluator because the ASTs carry its slot numbering.
+        # Dicts keep insertion order, so the first key is the least recently used.
+        self.programs = {}
+
+    def parse(self, text):
+        program = self.programs.pop(text, None)
+        if program is None:
+            program = tuple(Parser(*Lexer(text).tokenize(), self.symbols).parse())
+            if len(self.programs) >= _PARSE_CACHE_SIZE:
+                del self.programs[next(iter(self.programs))]
+        self.programs[text] = program
+        return program
+
+    def run(self, program):
+        variables = len(self.symbols.variables)
+        if len(self.slots) < variables:
+            self.slots.extend([None] * (variables - len(self.slots)))
+        functions = len(self.symbols.functions)
+        if len(self.functions) < functions:
+            self.functions.extend([None] * (functions - len(self.functions)))
+        for stmt in program:
+            stmt.execute(self)
+
+    def execute_block(self, body):
+        # variables created inside the block go out of scope when it ends
+        declared = self.declared
+        try:
+            for stmt in body:
+                stmt.execute(self)
+        finally:
+            self.declared = declared
 
 def repl():
     print("Custom Language REPL with 'create' keyword for variable declaration. Type 'exit;' to quit.")
-    env = {}
-    declared_vars = set()
-    functions = {}
+    # The evaluator is kept for the whole session so variables and functions persist
+    evaluator = Evaluator()
     while True:
         try:
-            user_input = ""
+            lines = []
             while True:
                 line = input(">>> ")
-                user_input += line + "\n"
+                lines.append(line)
                 if line.strip().endswith(';') or line.strip() == 'exit;':
                     break
+            user_input = "\n".join(lines) + "\n"
             if user_input.strip() == "exit;":
                 print("Exiting REPL.")
                 break
 
-            lexer = Lexer(user_input)
-            tokens = lexer.tokenize()
-            interpreter = Interpreter(tokens)
-            # Set env and functions for persistent state
-            interpreter.env = env
-            interpreter.declared_vars = declared_vars
-            interpreter.functions = functions
-            interpreter.parse()
-            # Save updated env and functions after execution
-            env = interpreter.env
-            declared_vars = interpreter.declared_vars
-            functions = interpreter.functions
+            evaluator.run(evaluator.parse(user_input))
 
         except Exception as e:
             print(f"Error: {e}")
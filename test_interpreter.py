@@ -0,0 +1,229 @@
+import contextlib
+import io
+import unittest
+import unittest.mock
+
+import interpreter
+from interpreter import Compare, CompareName, Evaluator, FunctionDef, If, Lexer, Literal, While
+
+def while_nodes(body):
+    for stmt in body:
+        if type(stmt) is While:
+            yield stmt
+            yield from while_nodes(stmt.body)
+        elif type(stmt) is If:
+            yield from while_nodes(stmt.body)
+            yield from while_nodes(stmt.orelse)
+        elif type(stmt) is FunctionDef:
+            yield from while_nodes(stmt.body)
+
+def run(inputs, threshold):
+    """Run each (source, repeat) input like the REPL would, with loops compiled
+    after `threshold` iterations. Returns the observable outcome of every run,
+    the final slots and declared mask, and the top-level while nodes."""
+    saved = interpreter._JIT_THRESHOLD
+    interpreter._JIT_THRESHOLD = threshold
+    try:
+        ev = Evaluator()
+        outcomes = []
+        loops = []
+        for source, repeat in inputs:
+            program = ev.parse(source)
+            loops.extend(while_nodes(program))
+            for _ in range(repeat):
+                out = io.StringIO()
+                error = None
+                with contextlib.redirect_stdout(out):
+                    try:
+                        ev.run(program)
+                    except Exception as e:
+                        error = (type(e), str(e))
+                outcomes.append((out.getvalue(), error))
+        return outcomes, list(ev.slots), ev.declared, loops
+    finally:
+        interpreter._JIT_THRESHOLD = saved
+
+def run_source(*sources):
+    """Run sources one after another in a fresh session, with loops never
+    compiled. Returns (stdout, error message or None) for the last one."""
+    saved = interpreter._JIT_THRESHOLD
+    interpreter._JIT_THRESHOLD = 10 ** 9
+    try:
+        ev = Evaluator()
+        for source in sources:
+            out = io.StringIO()
+            error = None
+            with contextlib.redirect_stdout(out):
+                try:
+                    ev.run(ev.parse(source))
+                except Exception as e:
+                    error = str(e)
+        return out.getvalue(), error
+    finally:
+        interpreter._JIT_THRESHOLD = saved
+
+def nested_loops(depth):
+    body = 'c = 0; print "x";'
+    for _ in range(depth):
+        body = 'while (c == 1) { ' + body + ' }'
+    return 'function f() { ' + body + ' }'
+
+class LexerTest(unittest.TestCase):
+    def test_two_character_operators(self):
+        types, values = Lexer('a == b != c <= d >= e < f > g = h').tokenize()
+        self.assertEqual(types, ['ID', 'COMPARE', 'ID', 'COMPARE', 'ID', 'COMPARE', 'ID', 'COMPARE',
+                                 'ID', 'COMPARE', 'ID', 'COMPARE', 'ID', 'ASSIGN', 'ID', 'EOF'])
+        self.assertEqual(values[1:14:2], ['==', '!=', '<=', '>=', '<', '>', '='])
+
+    def test_keyword_versus_identifier(self):
+        types, values = Lexer('while whilex _a1 create').tokenize()
+        self.assertEqual(types, ['WHILE', 'ID', 'ID', 'CREATE', 'EOF'])
+        self.assertEqual(values, ['while', 'whilex', '_a1', 'create', ''])
+
+    def test_multi_digit_number(self):
+        self.assertEqual(Lexer('1234 7').tokenize(), (['NUMBER', 'NUMBER', 'EOF'], [1234, 7, '']))
+
+    def test_string_containing_newline(self):
+        self.assertEqual(Lexer('"a\nb";').tokenize(), (['STRING', 'END', 'EOF'], ['a\nb', ';', '']))
+
+    def test_unexpected_characters(self):
+        for text, ch in [('!x', '!'), ('print "abc', '"'), ('create \u00e9 = 1;', '\u00e9')]:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(SyntaxError, f'^Unexpected character {ch}$'):
+                    Lexer(text).tokenize()
+
+class ShortCircuitTest(unittest.TestCase):
+    def test_literal_operands(self):
+        self.assertEqual(run_source('print 0 and nope;'), ('0\n', None))
+        self.assertEqual(run_source('print 1 or nope;'), ('1\n', None))
+        out, error = run_source('print 1 and nope;')
+        self.assertIn("'nope' not declared", error)
+
+    def test_variable_operands_decided_at_runtime(self):
+        # variables keep the parser from folding, so Logical.evaluate runs
+        self.assertEqual(run_source('create f = 0;', 'print f and nope;'), ('0\n', None))
+        self.assertEqual(run_source('create t = 1;', 'print t or nope;'), ('1\n', None))
+        out, error = run_source('create t = 1;', 'print t and nope;')
+        self.assertIn("'nope' not declared", error)
+        out, error = run_source('create f = 0;', 'print f or nope;')
+        self.assertIn("'nope' not declared", error)
+
+class ConstantFoldingTest(unittest.TestCase):
+    def folded(self, source):
+        return type(Evaluator().parse(source)[0].expr)
+
+    def test_mismatched_literals_raise_only_when_evaluated(self):
+        self.assertIs(self.folded('print 1 < "a";'), Compare)
+        out, error = run_source('print 1 < "a";')
+        self.assertIn("'<' not supported", error)
+        self.assertEqual(run_source('if (0) { print 1 < "a"; } print "ok";'), ('ok\n', None))
+
+    def test_short_circuit_folds_without_the_other_operand(self):
+        self.assertIs(self.folded('print 0 and nope;'), Literal)
+        self.assertIs(self.folded('print 1 or nope;'), Literal)
+        # that the folded values print 0 and 1 is covered by ShortCircuitTest
+
+    def test_chained_comparison_stays_left_associative(self):
+        self.assertIs(self.folded('print 1 < 2 < 3;'), Literal)
+        self.assertEqual(run_source('print 1 < 2 < 3;'), ('True\n', None))
+        # (3 > 2) > 1 is True > 1, not Python's 3 > 2 and 2 > 1
+        self.assertEqual(run_source('print 3 > 2 > 1;'), ('False\n', None))
+
+    def test_name_against_literal_is_specialised(self):
+        self.assertIs(self.folded('print q < 4;'), CompareName)
+        self.assertEqual(run_source('create q = 3;', 'print q < 4;'), ('True\n', None))
+
+class LoopCompilerMatchesInterpreter(unittest.TestCase):
+    """Every program must behave the same whether its loops are compiled
+    straight away, partway through, or never."""
+
+    def check(self, inputs, compiled, threshold=0):
+        jit = run(inputs, threshold)
+        interpreted = run(inputs, 10 ** 9)
+        self.assertEqual(jit[:3], interpreted[:3])
+        self.assertFalse(any(loop.kernel for loop in interpreted[3]))
+        # the outermost loop was handed to LoopCompiler; inner loops of one
+        # that stays interpreted may still compile on their own
+        outer = jit[3][0]
+        self.assertIsNotNone(outer.kernel)
+        self.assertEqual(bool(outer.kernel), compiled)
+        return jit[0]
+
+    def test_nested_if_and_while(self):
+        outcomes = self.check([
+            ('create i = 1; create k = 0; create s = "x";', 1),
+            ('while (i > 0) { if (k < 1) { print "once"; k = 1; } '
+             'else { i = 0; while (s == "x") { s = "y"; print s; } } }', 1),
+        ], compiled=True)
+        self.assertEqual(outcomes[-1], ('once\ny\n', None))
+
+    def test_single_entry_loop_compiled_partway_through(self):
+        # a three-bit counter: eight iterations, handed over after three
+        counter = ('while (c == 1) { if (a == 0) { a = 1; } else { if (b == 0) { a = 0; b = 1; } '
+                   'else { if (d == 0) { a = 0; b = 0; d = 1; } else { c = 0; } } } print a; }')
+        inputs = [
+            ('create a = 0; create b = 0; create c = 1; create d = 0;', 1),
+            (counter, 1),
+        ]
+        outcomes = self.check(inputs, compiled=True, threshold=3)
+        self.assertEqual(outcomes[-1], ('1\n0\n1\n0\n1\n0\n1\n1\n', None))
+
+        calls = []
+        compile_loop = interpreter.LoopCompiler.compile
+        def counted(compiler, loop):
+            func, mask = compile_loop(compiler, loop)
+            return lambda slots: calls.append(func(slots)), mask
+        with unittest.mock.patch.object(interpreter.LoopCompiler, 'compile', counted):
+            loops = run(inputs, 3)[3]
+        # the kernel took over the remaining iterations and counting stopped
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(loops[0].iterations, 3)
+
+    def test_undeclared_name_in_branch_never_taken(self):
+        outcomes = self.check([
+            ('create c = 1; create k = 0;', 1),
+            ('while (c == 1) { if (k == 1) { print nope; } c = 0; } print "done";', 1),
+        ], compiled=True)
+        self.assertEqual(outcomes[-1], ('done\n', None))
+
+    def test_undeclared_name_in_branch_taken_later(self):
+        outcomes = self.check([
+            ('create c = 1; create k = 0;', 1),
+            ('while (c == 1) { if (k == 1) { print nope; } print k; k = 1; }', 1),
+        ], compiled=True)
+        self.assertEqual(outcomes[-1][0], '0\n')
+        self.assertIn("'nope' not declared", outcomes[-1][1][1])
+
+    def test_type_error_partway_through_loop_keeps_earlier_assignments(self):
+        outcomes = self.check([
+            ('create i = 1; create s = 0; create t = 0;', 1),
+            ('while (i == 1) { s = 5; if (s == 5) { t = "set"; } i = i < "a"; }', 1),
+        ], compiled=True)
+        self.assertIs(outcomes[-1][1][0], TypeError)
+
+    def test_loop_in_function_called_repeatedly(self):
+        outcomes = self.check([
+            ('create c = 1; create n = 0;', 1),
+            ('function f() { while (c == 1) { print n; n = 1; c = n == 0; } }', 1),
+            ('f(); c = 1;', 60),
+        ], compiled=True)
+        self.assertEqual(outcomes[-1], ('1\n', None))
+
+    def test_nesting_past_compiler_block_limit_stays_interpreted(self):
+        outcomes = self.check([
+            ('create c = 1;', 1),
+            (nested_loops(20), 1),
+            ('f(); c = 1;', 60),
+        ], compiled=False)
+        self.assertEqual(outcomes[-1], ('x\n', None))
+
+    def test_guard_past_compiler_parenthesis_limit_stays_interpreted(self):
+        guard = ' and '.join(['c'] * 250)
+        outcomes = self.check([
+            ('create c = 1;', 1),
+            (f'while ({guard}) {{ c = 0; }} c = 1; print "ok";', 60),
+        ], compiled=False)
+        self.assertEqual(outcomes[-1], ('ok\n', None))
+
+if __name__ == '__main__':
+    unittest.main()